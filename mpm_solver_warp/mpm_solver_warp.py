@@ -151,6 +151,9 @@ class MPM_Simulator_WARP:
         self.particle_velocity_modifiers = []
         self.particle_velocity_modifier_params = []
 
+        # timers synchronize the device, which is not allowed while capturing
+        self.capturing = False
+
     # the h5 file should store particle initial position and volume.
     def load_from_sampling(
         self, sampling_h5, n_grid=100, grid_lim=1.0, device="cuda:0"
@@ -522,6 +525,7 @@ class MPM_Simulator_WARP:
         # compute stress = stress(returnMap(F_trial))
         with wp.ScopedTimer(
             "compute_stress_from_F_trial",
+            active=not self.capturing,
             synchronize=True,
             print=False,
             dict=self.time_profile,
@@ -536,6 +540,7 @@ class MPM_Simulator_WARP:
         # p2g
         with wp.ScopedTimer(
             "p2g",
+            active=not self.capturing,
             synchronize=True,
             print=False,
             dict=self.time_profile,
@@ -549,7 +554,11 @@ class MPM_Simulator_WARP:
 
         # grid update
         with wp.ScopedTimer(
-            "grid_update", synchronize=True, print=False, dict=self.time_profile
+            "grid_update",
+            active=not self.capturing,
+            synchronize=True,
+            print=False,
+            dict=self.time_profile,
         ):
             wp.launch(
                 kernel=grid_normalization_and_gravity,
@@ -568,7 +577,11 @@ class MPM_Simulator_WARP:
 
         # apply BC on grid
         with wp.ScopedTimer(
-            "apply_BC_on_grid", synchronize=True, print=False, dict=self.time_profile
+            "apply_BC_on_grid",
+            active=not self.capturing,
+            synchronize=True,
+            print=False,
+            dict=self.time_profile,
         ):
             for k in range(len(self.grid_postprocess)):
                 wp.launch(
@@ -588,7 +601,11 @@ class MPM_Simulator_WARP:
 
         # g2p
         with wp.ScopedTimer(
-            "g2p", synchronize=True, print=False, dict=self.time_profile
+            "g2p",
+            active=not self.capturing,
+            synchronize=True,
+            print=False,
+            dict=self.time_profile,
         ):
             wp.launch(
                 kernel=g2p,
@@ -607,6 +624,51 @@ class MPM_Simulator_WARP:
         #### CFL check ####
         self.time = self.time + dt
 
+    # the substeps only see host state through self.time, so they can be
+    # replayed from a graph if no operator switches on or off before end_time
+    def is_time_invariant(self, end_time):
+        if any(modify is not None for modify in self.modify_bc):
+            return False
+        params = (
+            self.collider_params
+            + self.impulse_params
+            + self.particle_velocity_modifier_params
+        )
+        for param in params:
+            always_on = param.start_time <= self.time and param.end_time >= end_time
+            always_off = param.end_time <= self.time or param.start_time >= end_time
+            if not (always_on or always_off):
+                return False
+        return True
+
+    # record num_steps p2g2p substeps into a CUDA graph, None if not replayable
+    # the graph holds the current state arrays, so recapture after a reset
+    def capture_p2g2p(self, num_steps, dt, end_time, device="cuda:0"):
+        if not self.is_time_invariant(end_time):
+            return None
+
+        # launches are verified by synchronizing, which capture_begin refuses
+        verify_cuda = wp.config.verify_cuda
+        wp.config.verify_cuda = False
+        time = self.time
+        try:
+            wp.capture_begin(device)
+            self.capturing = True
+            try:
+                for _ in range(num_steps):
+                    self.p2g2p(None, dt, device=device)
+            finally:
+                graph = wp.capture_end(device)
+        finally:
+            self.capturing = False
+            self.time = time
+            wp.config.verify_cuda = verify_cuda
+        return graph
+
+    def replay_p2g2p(self, graph, num_steps, dt):
+        wp.capture_launch(graph)
+        self.time = self.time + num_steps * dt
+
     # set particle densities to all_particle_densities,
     def reset_densities_and_update_masses(
         self, all_particle_densities, device="cuda:0"
@@ -668,7 +730,8 @@ class MPM_Simulator_WARP:
         F_tensor = F_tensor.reshape(-1, 9)
         return F_tensor
 
-    def export_particle_R_to_torch(self, device="cuda:0"):
+    # out: optional caller-owned (m, 3, 3) buffer, filled with the first m particles
+    def export_particle_R_to_torch(self, device="cuda:0", out=None):
         with wp.ScopedTimer(
             "compute_R_from_F",
             synchronize=True,
@@ -682,6 +745,13 @@ class MPM_Simulator_WARP:
                 device=device,
             )
 
+        if out is not None:
+            wp.copy(
+                wp.from_torch(out, dtype=wp.mat33),
+                self.mpm_state.particle_R,
+                count=out.shape[0],
+            )
+            return out
         R_tensor = wp.to_torch(self.mpm_state.particle_R)
         R_tensor = R_tensor.reshape(-1, 9)
         return R_tensor
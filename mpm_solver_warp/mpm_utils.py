@@ -689,4 +689,38 @@ def update_param(param: wp.array(dtype=float), grad: wp.array(dtype=float), lr:
     log_param = wp.log10(param[tid])
     log_param -= grad[tid] * lr
     log_param = wp.clamp(log_param, -1., upper)
-    param[tid] = wp.pow(10., log_param)
\ No newline at end of file
+    param[tid] = wp.pow(10., log_param)
+
+@wp.kernel()
+def reset_minmax(x_range: wp.array(dtype=float), k: int, value: float):
+    x_range[2 * k] = value
+    x_range[2 * k + 1] = -value
+
+
+@wp.kernel()
+def minmax_reduce(x: wp.array(dtype=float), x_range: wp.array(dtype=float), k: int):
+    tid = wp.tid()
+    wp.atomic_min(x_range, 2 * k, x[tid])
+    wp.atomic_max(x_range, 2 * k + 1, x[tid])
+
+
+@wp.kernel()
+def update_param_normalized(param: wp.array(dtype=float), grad: wp.array(dtype=float), grad_range: wp.array(dtype=float), k: int, lr: float, upper: float = -0.4):
+    tid = wp.tid()
+    grad_min = grad_range[2 * k]
+    grad_max = grad_range[2 * k + 1]
+    normalized_grad = float(0.0)
+    if grad_max - grad_min != 0.0:
+        normalized_grad = (grad[tid] - grad_min) / (grad_max - grad_min) - 0.5
+    log_param = wp.log10(param[tid])
+    log_param -= normalized_grad * lr
+    log_param = wp.clamp(log_param, -1., upper)
+    param[tid] = wp.pow(10., log_param)
+
+
+# min-max normalize param.grad to [-0.5, 0.5] and apply update_param, all on device
+# the gradient range is kept in grad_range[2k:2k+2] so several parameters share one buffer
+def normalize_and_update_param(param, grad_range, k, lr, upper, device="cuda:0"):
+    wp.launch(kernel=reset_minmax, dim=1, inputs=[grad_range, k, np.inf], device=device)
+    wp.launch(kernel=minmax_reduce, dim=param.shape[0], inputs=[param.grad, grad_range, k], device=device)
+    wp.launch(kernel=update_param_normalized, dim=param.shape[0], inputs=[param, param.grad, grad_range, k, lr, upper], device=device)
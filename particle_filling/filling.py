@@ -281,11 +281,11 @@ def get_particle_volume(pos, grid_n: int, grid_dx: float, unifrom: bool = False)
     compute_particle_volume(ti_pos, grid, particle_vol, grid_dx)
 
     if unifrom:
-        vol = particle_vol.to_torch()
+        vol = particle_vol.to_torch(device=pos.device)
         vol = torch.mean(vol).repeat(pos.shape[0])
         return vol
     else:
-        return particle_vol.to_torch()
+        return particle_vol.to_torch(device=pos.device)
 
 
 def fill_particles(
@@ -306,12 +306,9 @@ def fill_particles(
     pos_clone = pos.clone()
     if boundary is not None:
         assert len(boundary) == 6
-        mask = torch.ones(pos_clone.shape[0], dtype=torch.bool).cuda()
-        max_diff = 0.0
-        for i in range(3):
-            mask = torch.logical_and(mask, pos_clone[:, i] > boundary[2 * i])
-            mask = torch.logical_and(mask, pos_clone[:, i] < boundary[2 * i + 1])
-            max_diff = max(max_diff, boundary[2 * i + 1] - boundary[2 * i])
+        bounds = torch.tensor(boundary, device=pos_clone.device).view(3, 2)
+        mask = ((pos_clone > bounds[:, 0]) & (pos_clone < bounds[:, 1])).all(dim=1)
+        max_diff = max(boundary[2 * i + 1] - boundary[2 * i] for i in range(3))
 
         pos = pos[mask]
         opacity = opacity[mask]
@@ -372,7 +369,7 @@ def fill_particles(
     print("after internal grids: ", fill_num)
 
     # put new particles together with original particles
-    particles_tensor = particles.to_torch()[:fill_num].cuda()
+    particles_tensor = particles.to_torch(device=pos_clone.device)[:fill_num]
     if boundary is not None:
         particles_tensor = particles_tensor + new_origin
     particles_tensor = torch.cat([pos_clone, particles_tensor], dim=0)
@@ -435,9 +432,9 @@ def init_filled_particles(pos, shs, cov, opacity, new_pos):
         ti_new_cov,
     )
 
-    shs_tensor = ti_new_shs.to_torch().cuda()
-    opacity_tensor = ti_new_opacity.to_torch().cuda()
-    cov_tensor = ti_new_cov.to_torch().cuda()
+    shs_tensor = ti_new_shs.to_torch(device=shs.device)
+    opacity_tensor = ti_new_opacity.to_torch(device=shs.device)
+    cov_tensor = ti_new_cov.to_torch(device=shs.device)
 
     shs_tensor = torch.cat([shs, shs_tensor], dim=0)
     shs_tensor = shs_tensor.view(shs_tensor.shape[0], -1, 3)
@@ -29,7 +29,7 @@ from utils.graphics_utils import focal2fov
 # MPM dependencies
 from mpm_solver_warp.engine_utils import *
 from mpm_solver_warp.mpm_solver_warp import MPM_Simulator_WARP
-from mpm_solver_warp.mpm_utils import sum_array, sum_mat33, sum_vec3, wp_clamp, update_param
+from mpm_solver_warp.mpm_utils import sum_array, sum_mat33, sum_vec3, wp_clamp, normalize_and_update_param
 import warp as wp
 
 # Particle filling dependencies
@@ -40,7 +40,8 @@ from utils.decode_param import *
 from utils.transformation_utils import *
 from utils.camera_view_utils import *
 from utils.render_utils import *
-from utils.save_video import save_video
+from utils.ply_utils import read_ply_vertices, get_sorted_names, load_gaussians_from_vertices
+from utils.save_video import AsyncVideoWriter
 from utils.threestudio_utils import cleanup
 
 from video_distillation.guidance import ModelscopeGuidance
@@ -72,15 +73,13 @@ def load_checkpoint(model_path, iteration=-1):
     )
     
     # sh_degree=0, if you use a 3D asset without spherical harmonics
-    from plyfile import PlyData
-    plydata = PlyData.read(checkpt_path)
-    extra_f_names = [p.name for p in plydata.elements[0].properties if p.name.startswith("f_rest_")]
-    extra_f_names = sorted(extra_f_names, key = lambda x: int(x.split('_')[-1]))
+    vertices = read_ply_vertices(checkpt_path)
+    extra_f_names = get_sorted_names(vertices, "f_rest_")
     
     # Load guassians
     sh_degree = int(math.sqrt((len(extra_f_names)+3) // 3)) - 1
     gaussians = GaussianModel(sh_degree)
-    gaussians.load_ply(checkpt_path)
+    load_gaussians_from_vertices(gaussians, vertices)
     return gaussians
 
 
@@ -154,15 +153,16 @@ if __name__ == "__main__":
         None,
     )
     moving_pts_path = os.path.join(model_path, "moving_part_points.ply")
-    if os.path.exists(moving_pts_path):
+    has_moving_pts = os.path.exists(moving_pts_path)
+    if has_moving_pts:
         import point_cloud_utils as pcu
         moving_pts = pcu.load_mesh_v(moving_pts_path)
-        moving_pts = torch.from_numpy(moving_pts).float().to("cuda")
+        moving_pts = torch.from_numpy(moving_pts).float().pin_memory().to("cuda", non_blocking=True)
         # moving_pts = apply_rotations(moving_pts, rotation_matrices)
         freeze_mask = find_far_points(
             init_pos, moving_pts, thres=0.05
         ).bool()
-        moving_pts.to("cpu")
+        del moving_pts
         unselected_pos = init_pos[freeze_mask, :]
         unselected_cov = init_cov[freeze_mask, :]
         unselected_opacity = init_opacity[freeze_mask, :]
@@ -194,15 +194,28 @@ if __name__ == "__main__":
     if preprocessing_params["sim_area"] is not None:
         boundary = preprocessing_params["sim_area"]
         assert len(boundary) == 6
-        mask = torch.ones(rotated_pos.shape[0], dtype=torch.bool).to(device="cuda")
-        for i in range(3):
-            mask = torch.logical_and(mask, rotated_pos[:, i] > boundary[2 * i])
-            mask = torch.logical_and(mask, rotated_pos[:, i] < boundary[2 * i + 1])
-
-        unselected_pos = init_pos[~mask, :]
-        unselected_cov = init_cov[~mask, :]
-        unselected_opacity = init_opacity[~mask, :]
-        unselected_shs = init_shs[~mask, :]
+        boundary = torch.tensor(boundary).pin_memory().to("cuda", non_blocking=True).view(3, 2)
+        mask = (
+            (rotated_pos > boundary[:, 0]) & (rotated_pos < boundary[:, 1])
+        ).all(dim=1)
+
+        # gaussians outside the sim area join the ones frozen by the moving parts
+        sim_unselected = (
+            init_pos[~mask, :],
+            init_cov[~mask, :],
+            init_opacity[~mask, :],
+            init_shs[~mask, :],
+        )
+        if unselected_pos is None:
+            unselected_pos, unselected_cov, unselected_opacity, unselected_shs = sim_unselected
+        else:
+            unselected_pos, unselected_cov, unselected_opacity, unselected_shs = (
+                torch.cat([frozen, selected], dim=0)
+                for frozen, selected in zip(
+                    (unselected_pos, unselected_cov, unselected_opacity, unselected_shs),
+                    sim_unselected,
+                )
+            )
 
         rotated_pos = rotated_pos[mask, :]
         init_cov = init_cov[mask, :]
@@ -288,25 +301,28 @@ if __name__ == "__main__":
                 ),
                 rotation_matrices,
             )
+        # zeros for all appended attributes in one allocation: dc(3) + rest(15*3) + opacity(1) + scaling(3) + rotation(4)
+        _zeros = torch.zeros((_pos.shape[0], 56), device="cuda")
         print(gaussians._xyz.shape)
-        gaussians._xyz = nn.Parameter(torch.tensor(torch.cat([gaussians._xyz, _pos], 0), dtype=torch.float, device="cuda").requires_grad_(True))
-        _features_dc = torch.zeros((_pos.shape[0], 1, 3)).to("cuda:0")
+        gaussians._xyz = nn.Parameter(torch.cat([gaussians._xyz, _pos], 0).detach().requires_grad_(True))
+        _features_dc = _zeros[:, :3].view(-1, 1, 3)
         print(gaussians._features_dc.shape)
-        gaussians._features_dc = nn.Parameter(torch.tensor(torch.cat([gaussians._features_dc, _features_dc], 0), dtype=torch.float, device="cuda").requires_grad_(True))
-        _features_rest = torch.zeros((_pos.shape[0], 15, 3)).to("cuda:0")
+        gaussians._features_dc = nn.Parameter(torch.cat([gaussians._features_dc, _features_dc], 0).detach().requires_grad_(True))
+        _features_rest = _zeros[:, 3:48].view(-1, 15, 3)
         print(gaussians._features_rest.shape)
-        gaussians._features_rest = nn.Parameter(torch.tensor(torch.cat([gaussians._features_rest, _features_rest], 0), dtype=torch.float, device="cuda").requires_grad_(True))
-        _opacity = torch.zeros((_pos.shape[0], 1)).to("cuda:0")
-        gaussians._opacity = nn.Parameter(torch.tensor(torch.cat([gaussians._opacity, _opacity], 0), dtype=torch.float, device="cuda").requires_grad_(True))
-        _scaling = torch.zeros((_pos.shape[0], 3)).to("cuda:0")
-        gaussians._scaling = nn.Parameter(torch.tensor(torch.cat([gaussians._scaling, _scaling], 0), dtype=torch.float, device="cuda").requires_grad_(True))
-        _rotation = torch.zeros((_pos.shape[0], 4)).to("cuda:0")
-        gaussians._rotation = nn.Parameter(torch.tensor(torch.cat([gaussians._rotation, _rotation], 0), dtype=torch.float, device="cuda").requires_grad_(True))
+        gaussians._features_rest = nn.Parameter(torch.cat([gaussians._features_rest, _features_rest], 0).detach().requires_grad_(True))
+        _opacity = _zeros[:, 48:49]
+        gaussians._opacity = nn.Parameter(torch.cat([gaussians._opacity, _opacity], 0).detach().requires_grad_(True))
+        _scaling = _zeros[:, 49:52]
+        gaussians._scaling = nn.Parameter(torch.cat([gaussians._scaling, _scaling], 0).detach().requires_grad_(True))
+        _rotation = _zeros[:, 52:56]
+        gaussians._rotation = nn.Parameter(torch.cat([gaussians._rotation, _rotation], 0).detach().requires_grad_(True))
 
         gs_num = mpm_init_pos.shape[0]
     else:
-        mpm_init_cov = torch.zeros((mpm_init_pos.shape[0], 6), device=device)
+        mpm_init_cov = torch.empty((mpm_init_pos.shape[0], 6), device=device)
         mpm_init_cov[:gs_num] = init_cov
+        mpm_init_cov[gs_num:].zero_()
         shs = init_shs
         opacity = init_opacity
 
@@ -355,12 +371,16 @@ if __name__ == "__main__":
 
     # camera setting
     mpm_space_viewpoint_center = (
-        torch.tensor(camera_params["mpm_space_viewpoint_center"]).reshape((1, 3)).cuda()
+        torch.as_tensor(camera_params["mpm_space_viewpoint_center"])
+        .reshape((1, 3))
+        .pin_memory()
+        .to("cuda", non_blocking=True)
     )
     mpm_space_vertical_upward_axis = (
-        torch.tensor(camera_params["mpm_space_vertical_upward_axis"])
+        torch.as_tensor(camera_params["mpm_space_vertical_upward_axis"])
         .reshape((1, 3))
-        .cuda()
+        .pin_memory()
+        .to("cuda", non_blocking=True)
     )
     (
         viewpoint_center_worldspace,
@@ -373,6 +393,35 @@ if __name__ == "__main__":
         original_mean_pos,
     )
 
+    def get_frame_camera(frame):
+        return get_camera_view(
+            model_path,
+            default_camera_index=camera_params["default_camera_index"],
+            center_view_world_space=viewpoint_center_worldspace,
+            observant_coordinates=observant_coordinates,
+            show_hint=camera_params["show_hint"],
+            init_azimuthm=camera_params["init_azimuthm"],
+            init_elevation=camera_params["init_elevation"],
+            init_radius=camera_params["init_radius"],
+            move_camera=camera_params["move_camera"],
+            current_frame=frame,
+            delta_a=camera_params["delta_a"],
+            delta_e=camera_params["delta_e"],
+            delta_r=camera_params["delta_r"],
+        )
+
+    stage_num = 8
+    frame_per_stage = 16
+
+    # cameras only depend on the frame index, so they are all built up front
+    # a fixed camera gives the same view and rasterizer for every frame
+    num_cameras = stage_num * frame_per_stage if camera_params["move_camera"] else 1
+    cameras = [get_frame_camera(frame) for frame in range(num_cameras)]
+    rasterizers = [
+        initialize_resterize(camera, gaussians, pipeline, background)
+        for camera in cameras
+    ]
+
     # run the simulation
     if args.output_ply or args.output_h5:
         directory_to_save = os.path.join(args.output_path, "simulation_ply")
@@ -393,8 +442,28 @@ if __name__ == "__main__":
     step_per_frame = int(frame_dt / substep_dt)
     opacity_render = opacity
     shs_render = shs
-    height = None
-    width = None
+
+    # mpm space -> world space is a fixed affine map, fold it into one matmul per frame
+    with torch.no_grad():
+        M_inv, b_inv = get_inverse_transform(rotation_matrices, scale_origin, original_mean_pos)
+        cov_map = get_inverse_cov_transform(M_inv)
+
+    # unselected gaussians stay frozen, so their part of the rasterizer inputs
+    # is built once here and only the simulated prefix changes per frame
+    n_dyn = min(gs_num, init_len)
+    has_static = unselected_pos is not None
+    with torch.no_grad():
+        if has_static:
+            static_pos = unselected_pos.detach()
+            static_cov = unselected_cov.detach()
+            opacity_render = torch.cat([opacity_render, unselected_opacity], dim=0)
+            shs_render = torch.cat([shs_render, unselected_shs], dim=0)
+        else:
+            static_pos = torch.empty((0, 3), device=device)
+            static_cov = torch.empty((0, 6), device=device)
+    # frames shaded together in the visualization; every slot costs 18 floats per
+    # gaussian in the stage buffers, plus the (F, N, 3) temporaries of eval_sh
+    shade_frames = 4
     
     yaml_confs = OmegaConf.load(args.guidance_config)
     yaml_confs.prompt_processor.prompt = args.prompt
@@ -402,8 +471,14 @@ if __name__ == "__main__":
     prompt_processor = ModelscopePromptProcessor(yaml_confs.prompt_processor)
     prompt_utils = prompt_processor()
     
-    stage_num = 8
-    frame_per_stage = 16
+    optimized_params = [
+        mpm_solver.mpm_model.E,
+        mpm_solver.mpm_model.mu_N,
+        mpm_solver.mpm_model.lam_N,
+        mpm_solver.mpm_model.viscosity,
+    ]
+    # (min, max) of each optimized parameter's gradient
+    grad_range = wp.zeros(2 * len(optimized_params), dtype=float, device=device)
     for batch in range(50):
         loss_value = 0.
         img_list = []
@@ -415,24 +490,8 @@ if __name__ == "__main__":
             mpm_solver.p2g2p(None, substep_dt, device=device)
         
         for frame in tqdm(range(frame_per_stage)):
-            current_camera = get_camera_view(
-                model_path,
-                default_camera_index=camera_params["default_camera_index"],
-                center_view_world_space=viewpoint_center_worldspace,
-                observant_coordinates=observant_coordinates,
-                show_hint=camera_params["show_hint"],
-                init_azimuthm=camera_params["init_azimuthm"],
-                init_elevation=camera_params["init_elevation"],
-                init_radius=camera_params["init_radius"],
-                move_camera=camera_params["move_camera"],
-                current_frame=frame,
-                delta_a=camera_params["delta_a"],
-                delta_e=camera_params["delta_e"],
-                delta_r=camera_params["delta_r"],
-            )
-            rasterize = initialize_resterize(
-                current_camera, gaussians, pipeline, background
-            )
+            current_camera = cameras[frame % num_cameras]
+            rasterize = rasterizers[frame % num_cameras]
             
             for _ in range(step_per_frame * (1 + stage_num) - 1):
                 mpm_solver.p2g2p(frame, substep_dt, device=device)
@@ -447,26 +506,13 @@ if __name__ == "__main__":
             rot = rot.view(-1, 3, 3)[:gs_num].to(device)
 
             pos = pos[:init_len,:]
-            pos = apply_inverse_rotations(
-                undotransform2origin(
-                    undoshift2center111(pos), scale_origin, original_mean_pos
-                ),
-                rotation_matrices,
-            )
-            cov3D = cov3D / (scale_origin * scale_origin)
-            cov3D = apply_inverse_cov_rotations(cov3D, rotation_matrices)
+            pos = apply_inverse_transform(pos, M_inv, b_inv)
+            cov3D = apply_inverse_cov_transform(cov3D, cov_map)
+            if has_static:
+                pos = torch.cat([pos, static_pos], dim=0)
+                cov3D = torch.cat([cov3D, static_cov], dim=0)
             opacity = opacity_render
             shs = shs_render
-            if preprocessing_params["sim_area"] is not None:
-                pos = torch.cat([pos, unselected_pos], dim=0)
-                cov3D = torch.cat([cov3D, unselected_cov], dim=0)
-                opacity = torch.cat([opacity_render, unselected_opacity], dim=0)
-                shs = torch.cat([shs_render, unselected_shs], dim=0)
-            if os.path.exists(moving_pts_path):
-                pos = torch.cat([pos, unselected_pos], dim=0)
-                cov3D = torch.cat([cov3D, unselected_cov], dim=0)
-                opacity = torch.cat([opacity_render, unselected_opacity], dim=0)
-                shs = torch.cat([shs_render, unselected_shs], dim=0)
 
             colors_precomp = convert_SH(shs, current_camera, gaussians, pos, rot)
             rendering, raddi = rasterize(
@@ -501,111 +547,112 @@ if __name__ == "__main__":
         wp.launch(sum_array, mpm_solver.n_particles*6, [mpm_solver.mpm_state.particle_cov, grad_cov], [loss_wp], device=device)
         wp.launch(sum_mat33, mpm_solver.n_particles, [mpm_solver.mpm_state.particle_R, grad_r], [loss_wp], device=device)
         tape.backward(loss=loss_wp)
-        grad = wp.to_torch(mpm_solver.mpm_model.E.grad)
-        max_grad, min_grad = torch.max(grad), torch.min(grad)
-        grad = (grad - min_grad) / (max_grad - min_grad) - 0.5 if max_grad - min_grad != 0 else torch.zeros_like(grad)
-        wp.launch(update_param, mpm_solver.n_particles, [mpm_solver.mpm_model.E, wp.from_torch(grad), 1.0, -0.4])
+        normalize_and_update_param(mpm_solver.mpm_model.E, grad_range, 0, 1.0, -0.4, device=device)
         
         # add
-        grad_mu_N = wp.to_torch(mpm_solver.mpm_model.mu_N.grad)
-        max_grad, min_grad = torch.max(grad_mu_N), torch.min(grad_mu_N)
-        grad_mu_N = (grad_mu_N - min_grad) / (max_grad - min_grad) - 0.5 if max_grad - min_grad != 0 else torch.zeros_like(grad_mu_N)
-        wp.launch(update_param, mpm_solver.n_particles, [mpm_solver.mpm_model.mu_N, wp.from_torch(grad_mu_N), 1.0, 1.0])
-        
-        grad_lam_N = wp.to_torch(mpm_solver.mpm_model.lam_N.grad)
-        max_grad, min_grad = torch.max(grad_lam_N), torch.min(grad_lam_N)
-        grad_lam_N = (grad_lam_N - min_grad) / (max_grad - min_grad) - 0.5 if max_grad - min_grad != 0 else torch.zeros_like(grad_lam_N)
-        wp.launch(update_param, mpm_solver.n_particles, [mpm_solver.mpm_model.lam_N, wp.from_torch(grad_lam_N), 1.0, 1.0])
+        normalize_and_update_param(mpm_solver.mpm_model.mu_N, grad_range, 1, 1.0, 1.0, device=device)
+        normalize_and_update_param(mpm_solver.mpm_model.lam_N, grad_range, 2, 1.0, 1.0, device=device)
+        normalize_and_update_param(mpm_solver.mpm_model.viscosity, grad_range, 3, 1.0, 2.0, device=device)
         
-        grad_viscosity = wp.to_torch(mpm_solver.mpm_model.viscosity.grad)
-        max_grad, min_grad = torch.max(grad_viscosity), torch.min(grad_viscosity)
-        grad_viscosity = (grad_viscosity - min_grad) / (max_grad - min_grad) - 0.5 if max_grad - min_grad != 0 else torch.zeros_like(grad_viscosity)
-        wp.launch(update_param, mpm_solver.n_particles, [mpm_solver.mpm_model.viscosity, wp.from_torch(grad_viscosity), 1.0, 2.0])
-        
-        print("grad: ", torch.mean(grad), torch.max(wp.to_torch(mpm_solver.mpm_model.E.grad)), torch.min(wp.to_torch(mpm_solver.mpm_model.E.grad)))
-        print("grad_mu_N: ", torch.mean(grad_mu_N), torch.max(wp.to_torch(mpm_solver.mpm_model.mu_N.grad)), torch.min(wp.to_torch(mpm_solver.mpm_model.mu_N.grad)))
-        print("grad_lam_N: ", torch.mean(grad_lam_N))
-        print("grad_viscosity: ", torch.mean(grad_viscosity))
-        print("E: ", torch.max(wp.to_torch(mpm_solver.mpm_model.E)), torch.min(wp.to_torch(mpm_solver.mpm_model.E)), torch.mean(wp.to_torch(mpm_solver.mpm_model.E)))
-        print("mu_N: ", torch.max(wp.to_torch(mpm_solver.mpm_model.mu_N)), torch.min(wp.to_torch(mpm_solver.mpm_model.mu_N)), torch.mean(wp.to_torch(mpm_solver.mpm_model.mu_N)))
-        print("lam_N: ", torch.max(wp.to_torch(mpm_solver.mpm_model.lam_N)), torch.min(wp.to_torch(mpm_solver.mpm_model.lam_N)), torch.mean(wp.to_torch(mpm_solver.mpm_model.lam_N)))
-        print("viscosity: ", torch.max(wp.to_torch(mpm_solver.mpm_model.viscosity)), torch.min(wp.to_torch(mpm_solver.mpm_model.viscosity)), torch.mean(wp.to_torch(mpm_solver.mpm_model.viscosity)))
+        # gather the logged statistics and read them back in one transfer
+        # columns: grad min, grad max, param max, param min, param mean, grad mean
+        stats = torch.cat(
+            [
+                wp.to_torch(grad_range).view(-1, 2),
+                torch.stack(
+                    [
+                        torch.stack([
+                            torch.max(wp.to_torch(p)),
+                            torch.min(wp.to_torch(p)),
+                            torch.mean(wp.to_torch(p)),
+                            torch.mean(wp.to_torch(p.grad)),
+                        ])
+                        for p in optimized_params
+                    ]
+                ),
+            ],
+            dim=1,
+        ).cpu()
+        # mean of the min-max normalized gradient that was applied in the update
+        grad_min, grad_max, grad_mean = stats[:, 0], stats[:, 1], stats[:, 5]
+        grad_span = grad_max - grad_min
+        normalized_grad_mean = torch.where(
+            grad_span != 0, (grad_mean - grad_min) / grad_span - 0.5, torch.zeros_like(grad_span)
+        )
+        print("grad: ", normalized_grad_mean[0].item(), grad_max[0].item(), grad_min[0].item())
+        print("grad_mu_N: ", normalized_grad_mean[1].item(), grad_max[1].item(), grad_min[1].item())
+        print("grad_lam_N: ", normalized_grad_mean[2].item())
+        print("grad_viscosity: ", normalized_grad_mean[3].item())
+        for i, name in enumerate(["E", "mu_N", "lam_N", "viscosity"]):
+            print("%s: " % name, *stats[i, 2:5].tolist())
         
         mpm_solver.reset_pos_from_torch(mpm_init_pos, mpm_init_vol, mpm_init_cov)
         if batch % 2 == 0:
             mpm_solver.finalize_mu_lam()
-            for frame in tqdm(range(stage_num * frame_per_stage)):
-                current_camera = get_camera_view(
-                    model_path,
-                    default_camera_index=camera_params["default_camera_index"],
-                    center_view_world_space=viewpoint_center_worldspace,
-                    observant_coordinates=observant_coordinates,
-                    show_hint=camera_params["show_hint"],
-                    init_azimuthm=camera_params["init_azimuthm"],
-                    init_elevation=camera_params["init_elevation"],
-                    init_radius=camera_params["init_radius"],
-                    move_camera=camera_params["move_camera"],
-                    current_frame=frame,
-                    delta_a=camera_params["delta_a"],
-                    delta_e=camera_params["delta_e"],
-                    delta_r=camera_params["delta_r"],
-                )
-                rasterize = initialize_resterize(
-                    current_camera, gaussians, pipeline, background
-                )
-                
-                for _ in range(step_per_frame):
-                    mpm_solver.p2g2p(frame, substep_dt, device=device)
-
-                pos = mpm_solver.export_particle_x_to_torch()[:gs_num].to(device)
-                cov3D = mpm_solver.export_particle_cov_to_torch()
-                rot = mpm_solver.export_particle_R_to_torch()
-                
-                cov3D = cov3D.view(-1, 6)[:gs_num].to(device)
-                rot = rot.view(-1, 3, 3)[:gs_num].to(device)
-
-                pos = pos[:init_len,:]
-                pos = apply_inverse_rotations(
-                    undotransform2origin(
-                        undoshift2center111(pos), scale_origin, original_mean_pos
-                    ),
-                    rotation_matrices,
-                )
-                cov3D = cov3D / (scale_origin * scale_origin)
-                cov3D = apply_inverse_cov_rotations(cov3D, rotation_matrices)
-                opacity = opacity_render
-                shs = shs_render
-                if preprocessing_params["sim_area"] is not None:
-                    pos = torch.cat([pos, unselected_pos], dim=0)
-                    cov3D = torch.cat([cov3D, unselected_cov], dim=0)
-                    opacity = torch.cat([opacity_render, unselected_opacity], dim=0)
-                    shs = torch.cat([shs_render, unselected_shs], dim=0)
-                if os.path.exists(moving_pts_path):
-                    pos = torch.cat([pos, unselected_pos], dim=0)
-                    cov3D = torch.cat([cov3D, unselected_cov], dim=0)
-                    opacity = torch.cat([opacity_render, unselected_opacity], dim=0)
-                    shs = torch.cat([shs_render, unselected_shs], dim=0)
-
-                colors_precomp = convert_SH(shs, current_camera, gaussians, pos, rot)
-                rendering, raddi = rasterize(
-                    means3D=pos,
-                    means2D=init_screen_points,
-                    shs=None,
-                    colors_precomp=colors_precomp,
-                    opacities=opacity,
-                    scales=None,
-                    rotations=None,
-                    cov3D_precomp=cov3D,
+            # nothing is taped here, so a frame's substeps are replayed as one graph
+            p2g2p_graph = mpm_solver.capture_p2g2p(
+                step_per_frame,
+                substep_dt,
+                stage_num * frame_per_stage * step_per_frame * substep_dt,
+                device=device,
+            )
+            assert args.output_path is not None
+            video_writer = AsyncVideoWriter(
+                args.output_path,
+                os.path.join(args.output_path, 'video%02d.mp4' % batch),
+            )
+            # nothing here is differentiated, so skip autograd bookkeeping entirely
+            with torch.inference_mode():
+                # stage buffers only live for this pass, one slot per frame of a shading chunk
+                full_pos = torch.empty(
+                    (shade_frames, n_dyn + static_pos.shape[0], 3), device=device
                 )
-                
-                cv2_img = rendering.permute(1, 2, 0).detach().cpu().numpy()
-                cv2_img = cv2.cvtColor(cv2_img, cv2.COLOR_BGR2RGB)
-                if height is None or width is None:
-                    height = cv2_img.shape[0] // 2 * 2
-                    width = cv2_img.shape[1] // 2 * 2
-                assert args.output_path is not None
-                cv2.imwrite(
-                    os.path.join(args.output_path, f"{frame}.png".rjust(8, "0")),
-                    255 * cv2_img,
+                full_cov = torch.empty(
+                    (shade_frames, n_dyn + static_cov.shape[0], 6), device=device
                 )
-            save_video(args.output_path, os.path.join(args.output_path, 'video%02d.mp4' % batch))
+                full_rot = torch.empty((shade_frames, gs_num, 3, 3), device=device)
+                full_pos[:, n_dyn:] = static_pos
+                full_cov[:, n_dyn:] = static_cov
+
+                num_frames = stage_num * frame_per_stage
+                for frame in tqdm(range(num_frames)):
+                    if p2g2p_graph is not None:
+                        mpm_solver.replay_p2g2p(p2g2p_graph, step_per_frame, substep_dt)
+                    else:
+                        for _ in range(step_per_frame):
+                            mpm_solver.p2g2p(frame, substep_dt, device=device)
+
+                    slot = frame % shade_frames
+                    # x and cov are zero-copy views of the solver arrays, R is kept per slot
+                    pos = mpm_solver.export_particle_x_to_torch()[:n_dyn]
+                    cov3D = mpm_solver.export_particle_cov_to_torch().view(-1, 6)[:n_dyn]
+                    mpm_solver.export_particle_R_to_torch(out=full_rot[slot])
+
+                    apply_inverse_transform(pos, M_inv, b_inv, out=full_pos[slot, :n_dyn])
+                    apply_inverse_cov_transform(cov3D, cov_map, out=full_cov[slot, :n_dyn])
+                    if slot < shade_frames - 1 and frame < num_frames - 1:
+                        continue
+
+                    # shade the frames of the chunk in one pass over the SH coefficients
+                    chunk_frames = range(frame - slot, frame + 1)
+                    colors_precomp = convert_SH_batched(
+                        shs_render,
+                        [cameras[f % num_cameras] for f in chunk_frames],
+                        gaussians,
+                        full_pos[: slot + 1],
+                        full_rot[: slot + 1],
+                    )
+                    for i, f in enumerate(chunk_frames):
+                        rendering, raddi = rasterizers[f % num_cameras](
+                            means3D=full_pos[i],
+                            means2D=init_screen_points,
+                            shs=None,
+                            colors_precomp=colors_precomp[i],
+                            opacities=opacity_render,
+                            scales=None,
+                            rotations=None,
+                            cov3D_precomp=full_cov[i],
+                        )
+                        video_writer.append(rendering, f"{f}.png".rjust(8, "0"))
+                del full_pos, full_cov, full_rot, colors_precomp
+            video_writer.close()
@@ -370,22 +370,49 @@ def find_far_points(xyzs, selected_points, thres=0.05):
         freeze_mask: [N], 1 for points that are far away, 0 for points that are close
                     dtype=torch.int
     """
-    chunk_size = 10000
-
-    freeze_mask_list = []
-    for i in range(0, xyzs.shape[0], chunk_size):
-
-        end_index = min(i + chunk_size, xyzs.shape[0])
-        xyzs_chunk = xyzs[i:end_index]
-        # [M, N]
-        cdist = torch.cdist(xyzs_chunk, selected_points)
-
-        min_dist, _ = torch.min(cdist, dim=-1)
-        freeze_mask = min_dist > thres
-        freeze_mask = freeze_mask.type(torch.int)
-        freeze_mask_list.append(freeze_mask)
-
-    freeze_mask = torch.cat(freeze_mask_list, dim=0)
+    device = xyzs.device
+    close = torch.zeros(xyzs.shape[0], dtype=torch.bool, device=device)
+    if selected_points.shape[0] == 0:
+        return (~close).type(torch.int)
+
+    # hash selected points into cells of size thres, so every selected point
+    # within thres of a query lies in one of the 27 cells around the query
+    origin = torch.min(selected_points, dim=0)[0]
+    cells = torch.floor((selected_points - origin) / thres).long() + 1
+    dims = torch.max(cells, dim=0)[0] + 2
+
+    def cell_key(c):
+        return (c[:, 0] * dims[1] + c[:, 1]) * dims[2] + c[:, 2]
+
+    keys, order = torch.sort(cell_key(cells))
+    sorted_points = selected_points[order]
+    cell_keys, cell_counts = torch.unique_consecutive(keys, return_counts=True)
+    cell_starts = torch.cumsum(cell_counts, dim=0) - cell_counts
+
+    query_cells = torch.floor((xyzs - origin) / thres).long() + 1
+    offsets = torch.stack(
+        torch.meshgrid(*[torch.arange(-1, 2, device=device)] * 3, indexing="ij"),
+        dim=-1,
+    ).reshape(-1, 3)
+    for offset in offsets:
+        neighbor = query_cells + offset
+        inside = torch.all((neighbor >= 0) & (neighbor < dims), dim=1)
+        key = cell_key(torch.minimum(torch.clamp(neighbor, min=0), dims - 1))
+        idx = torch.clamp(torch.searchsorted(cell_keys, key), max=cell_keys.shape[0] - 1)
+        # queries already known to be close are skipped
+        found = inside & (cell_keys[idx] == key) & ~close
+        query = torch.nonzero(found).squeeze(1)
+        if query.shape[0] == 0:
+            continue
+        start = cell_starts[idx[query]]
+        count = cell_counts[idx[query]]
+        for i in range(int(torch.max(count))):
+            valid = count > i
+            q = query[valid]
+            dist = torch.sum((xyzs[q] - sorted_points[start[valid] + i]) ** 2, dim=-1)
+            close[q] = close[q] | (dist <= thres * thres)
+
+    freeze_mask = (~close).type(torch.int)
 
     # 1 for points that are far away, 0 for points that are close
     return freeze_mask
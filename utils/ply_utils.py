@@ -0,0 +1,124 @@
+import numpy as np
+import torch
+from torch import nn
+from scene.gaussian_model import GaussianModel
+
+
+ply_dtypes = {
+    "char": "i1",
+    "int8": "i1",
+    "uchar": "u1",
+    "uint8": "u1",
+    "short": "i2",
+    "int16": "i2",
+    "ushort": "u2",
+    "uint16": "u2",
+    "int": "i4",
+    "int32": "i4",
+    "uint": "u4",
+    "uint32": "u4",
+    "float": "f4",
+    "float32": "f4",
+    "double": "f8",
+    "float64": "f8",
+}
+
+
+def read_ply_header(path):
+    """Parse the header of a ply file.
+
+    Returns the format, the byte offset of the body and a list of
+    (element_name, count, [(property_name, property_type), ...]).
+    """
+    elements = []
+    fmt = None
+    with open(path, "rb") as f:
+        if f.readline().strip() != b"ply":
+            raise ValueError(f"{path} is not a ply file")
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"{path} has no end_header")
+            tokens = line.decode("ascii").split()
+            if not tokens or tokens[0] in ("comment", "obj_info"):
+                continue
+            if tokens[0] == "end_header":
+                break
+            if tokens[0] == "format":
+                fmt = tokens[1]
+            elif tokens[0] == "element":
+                elements.append((tokens[1], int(tokens[2]), []))
+            elif tokens[0] == "property":
+                # list properties are not supported by the fast path
+                if tokens[1] == "list":
+                    elements[-1][2].append((tokens[-1], "list"))
+                else:
+                    elements[-1][2].append((tokens[2], tokens[1]))
+        offset = f.tell()
+    return fmt, offset, elements
+
+
+def read_ply_vertices(path):
+    """Read the vertex element of a ply file into a numpy structured array."""
+    fmt, offset, elements = read_ply_header(path)
+    name, count, properties = elements[0]
+    if (
+        name == "vertex"
+        and fmt in ("binary_little_endian", "binary_big_endian")
+        and all(p_type in ply_dtypes for _, p_type in properties)
+    ):
+        byte_order = "<" if fmt == "binary_little_endian" else ">"
+        dtype = np.dtype(
+            [(p_name, byte_order + ply_dtypes[p_type]) for p_name, p_type in properties]
+        )
+        return np.fromfile(path, dtype=dtype, count=count, offset=offset)
+
+    # ascii files and list properties go through plyfile
+    from plyfile import PlyData
+
+    return PlyData.read(path).elements[0].data
+
+
+def get_sorted_names(vertices, prefix):
+    names = [name for name in vertices.dtype.names if name.startswith(prefix)]
+    return sorted(names, key=lambda x: int(x.split("_")[-1]))
+
+
+def load_gaussians_from_vertices(gaussians: GaussianModel, vertices):
+    """Same as GaussianModel.load_ply but takes an already parsed vertex array."""
+
+    def stack(names):
+        if len(names) == 0:
+            return np.zeros((vertices.shape[0], 0), dtype=np.float32)
+        return np.stack([vertices[name] for name in names], axis=1).astype(np.float32)
+
+    def to_param(array):
+        return nn.Parameter(
+            torch.from_numpy(array)
+            .pin_memory()
+            .to(device="cuda", non_blocking=True)
+            .contiguous()
+            .requires_grad_(True)
+        )
+
+    n_coeffs = (gaussians.max_sh_degree + 1) ** 2
+    extra_f_names = get_sorted_names(vertices, "f_rest_")
+    assert len(extra_f_names) == 3 * n_coeffs - 3
+
+    xyz = stack(["x", "y", "z"])
+    opacities = stack(["opacity"])
+    # (P, F, SH_coeffs) -> (P, SH_coeffs, F)
+    features_dc = stack(["f_dc_0", "f_dc_1", "f_dc_2"]).reshape(-1, 3, 1)
+    features_extra = stack(extra_f_names).reshape((vertices.shape[0], 3, n_coeffs - 1))
+    scales = stack(get_sorted_names(vertices, "scale_"))
+    rots = stack(get_sorted_names(vertices, "rot"))
+
+    gaussians._xyz = to_param(xyz)
+    gaussians._features_dc = to_param(features_dc.transpose(0, 2, 1))
+    gaussians._features_rest = to_param(features_extra.transpose(0, 2, 1))
+    gaussians._opacity = to_param(opacities)
+    gaussians._scaling = to_param(scales)
+    gaussians._rotation = to_param(rots)
+
+    gaussians.active_sh_degree = gaussians.max_sh_degree
+    return gaussians
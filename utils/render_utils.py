@@ -128,3 +128,28 @@ def convert_SH(
     colors_precomp = torch.clamp_min(sh2rgb + 0.5, 0.0)
 
     return colors_precomp
+
+
+def convert_SH_batched(
+    shs_view,
+    viewpoint_cameras,
+    pc: GaussianModel,
+    positions: torch.tensor,
+    rotations: torch.tensor = None,
+):
+    # same as convert_SH for F frames at once: positions (F, N, 3), rotations (F, n, 3, 3)
+    # the SH coefficients are shared by all frames and broadcast over the frame axis
+    shs_view = shs_view.transpose(1, 2).view(-1, 3, (pc.max_sh_degree + 1) ** 2)
+    camera_centers = torch.stack([camera.camera_center for camera in viewpoint_cameras])
+    dir_pp = positions - camera_centers.unsqueeze(1)
+    if rotations is not None:
+        n = rotations.shape[1]
+        dir_pp[:, :n] = torch.matmul(rotations, dir_pp[:, :n].clone().unsqueeze(-1)).squeeze(-1)
+
+    dir_pp_normalized = dir_pp / dir_pp.norm(dim=-1, keepdim=True)
+    sh2rgb = eval_sh(pc.active_sh_degree, shs_view.unsqueeze(0), dir_pp_normalized)
+    # degree 0 ignores the directions and keeps the broadcast frame axis of size 1
+    sh2rgb = sh2rgb.expand(positions.shape[0], -1, -1)
+    colors_precomp = torch.clamp_min(sh2rgb + 0.5, 0.0)
+
+    return colors_precomp
@@ -1,5 +1,8 @@
 import os
+import cv2
 import imageio
+import torch
+from concurrent.futures import ThreadPoolExecutor
 
 
 def save_video(folder, output_filename, fps=30):
@@ -8,3 +11,45 @@ def save_video(folder, output_filename, fps=30):
         if filename.endswith('.png'):
             image.append(imageio.v2.imread(os.path.join(folder, filename)))
     imageio.mimsave(output_filename, image, fps=fps)
+
+
+class AsyncVideoWriter:
+    """Save rendered frames as png and encode them into a video on a background thread.
+
+    The render loop only issues the device to host copy; png encoding and
+    video encoding overlap with the next frames.
+    """
+
+    def __init__(self, folder, output_filename, fps=30):
+        self.folder = folder
+        self.video = imageio.get_writer(output_filename, fps=fps)
+        # a single worker keeps the frames in order
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.futures = []
+
+    # rendering is a (3, H, W) cuda tensor in [0, 1]
+    def append(self, rendering, filename):
+        frame = rendering.detach().mul(255).clamp(0, 255).round().to(torch.uint8)
+        frame = frame.permute(1, 2, 0)
+        staging = torch.empty(frame.shape, dtype=torch.uint8, pin_memory=True)
+        staging.copy_(frame, non_blocking=True)
+        copied = torch.cuda.Event()
+        copied.record()
+        self.futures.append(
+            self.executor.submit(self._write, staging, copied, filename)
+        )
+
+    def _write(self, staging, copied, filename):
+        copied.synchronize()
+        image = staging.numpy()
+        cv2.imwrite(
+            os.path.join(self.folder, filename),
+            cv2.cvtColor(image, cv2.COLOR_RGB2BGR),
+        )
+        self.video.append_data(image)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.video.close()
+        for future in self.futures:
+            future.result()
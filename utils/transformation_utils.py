@@ -37,7 +37,7 @@ def generate_rotation_matrix(degree, axis):
         )
     else:
         raise ValueError("Invalid axis selection")
-    return rotation_matrix.cuda()
+    return rotation_matrix.pin_memory().to("cuda", non_blocking=True)
 
 
 def generate_rotation_matrices(degrees, axises):
@@ -140,6 +140,30 @@ def undo_all_transforms(input, rotation_matrices, scale_origin, original_mean_po
     )
 
 
+# undo_all_transforms as one affine map: x_world = M_inv @ x + b_inv
+def get_inverse_transform(rotation_matrices, scale_origin, original_mean_pos):
+    A = torch.eye(3, device="cuda")
+    for i in range(len(rotation_matrices)):
+        A = torch.mm(A, rotation_matrices[len(rotation_matrices) - 1 - i])
+    M_inv = A.T / scale_origin
+    b_inv = torch.mv(A.T, original_mean_pos - 1.0 / scale_origin)
+    return M_inv, b_inv
+
+
+# apply_inverse_cov_rotations(cov / scale^2) as a (6,6) map on the upper entries
+def get_inverse_cov_transform(M_inv):
+    basis = get_mat_from_upper(torch.eye(6, device="cuda"))
+    return get_uppder_from_mat(torch.matmul(torch.matmul(M_inv, basis), M_inv.T))
+
+
+def apply_inverse_transform(position_tensor, M_inv, b_inv, out=None):
+    return torch.addmm(b_inv, position_tensor, M_inv.T, out=out)
+
+
+def apply_inverse_cov_transform(upper_cov_tensor, cov_map, out=None):
+    return torch.mm(upper_cov_tensor, cov_map, out=out)
+
+
 def get_center_view_worldspace_and_observant_coordinate(
     mpm_space_viewpoint_center,
     mpm_space_vertical_upward_axis,